@@ -12,11 +12,22 @@
 # ===========================================================
 
 import gc
+import struct
 import time
 import board
 import busio
 
-DEBUG = True
+try:
+    from micropython import const
+except ImportError:
+
+    def const(x):
+        return x
+
+
+# Trace output (hexdumps, per-event lines). const() lets the compiler drop the
+# `if DEBUG:` blocks outright when this is False; set True when bench-debugging.
+DEBUG = const(False)
 
 
 def dprint(*a):
@@ -24,6 +35,18 @@ def dprint(*a):
         print(*a)
 
 
+def hexdump(data, width=16):
+    """Return data as space-separated uppercase hex, width bytes per line."""
+    if not data:
+        return "<empty>"
+    # bytes.hex(sep) runs in C; only the line wrapping is done here.
+    h = bytes(data).hex(" ").upper()
+    if len(data) <= width:
+        return h
+    step = width * 3
+    return "\n".join(h[i : i + step - 1] for i in range(0, len(h), step))
+
+
 NX_BAUD = 9600
 BM83_BAUD = 115200
 
@@ -34,16 +57,20 @@ BLE_ENABLED = True
 BLE_NAME = "AmpBench Remote"
 
 TERM = b"\xFF\xFF\xFF"
-TOKENS = {
-    b"BT_POWER",
-    b"BT_POWEROFF",
-    b"BT_PAIR",
-    b"BT_PLAY",
-    b"BT_PREV",
-    b"BT_NEXT",
-    b"BT_VOLUP",
-    b"BT_VOLDN",
-}
+# RX cursors drop their consumed prefix once it grows past this many bytes.
+RX_COMPACT_AT = 512
+TOKENS = frozenset(
+    (
+        b"BT_POWER",
+        b"BT_POWEROFF",
+        b"BT_PAIR",
+        b"BT_PLAY",
+        b"BT_PREV",
+        b"BT_NEXT",
+        b"BT_VOLUP",
+        b"BT_VOLDN",
+    )
+)
 
 EQ_OBJ_PAGE0 = "tEQ0"
 EQ_OBJ_PAGE1 = "tEQ1"
@@ -57,16 +84,41 @@ NX_RUNTIME = {
     "track_num": "tTrack_num",
     "total_tracks": "tTotalTracks",
 }
+# Fixed (key, object) pairs for page-1 refreshes, built once.
+NX_RUNTIME_FIELDS = tuple(NX_RUNTIME.items())
+# Play-status updates only touch these two fields.
+NX_TIME_FIELDS = (("time_cur", NX_RUNTIME["time_cur"]), ("time", NX_RUNTIME["time"]))
+
+# AVRCP GetElementAttributes id -> (NX_RUNTIME key, max text length).
+# Attribute 7 (playing time, ms) is formatted separately via _fmt_ms.
+AVRCP_ATTR_KEYS = {
+    1: ("title", 48),
+    2: ("artist", 48),
+    3: ("album", 48),
+    4: ("track_num", 8),
+    5: ("total_tracks", 8),
+    6: ("genre", 48),
+}
+AVRCP_ATTR_PLAYING_TIME = 7
+
+# "00".."59" for the zero-padded minute/second fields of _fmt_ms
+_D2 = tuple("%02d" % i for i in range(60))
 
 
 def _sanitize_text(txt, max_len=48):
     if txt is None:
         return "—"
-    out = []
-    for ch in str(txt):
-        o = ord(ch)
-        out.append(ch if 32 <= o <= 126 else " ")
-    s = "".join(out).replace('"', "'").strip()
+    s = str(txt)
+    # min()/max() scan the encoded bytes in C; only text that actually contains
+    # non-printable or non-ASCII characters pays for the per-character loop.
+    raw = s.encode()
+    if raw and (min(raw) < 32 or max(raw) > 126):
+        s = "".join(ch if 32 <= ord(ch) <= 126 else " " for ch in s)
+    # '"' would end the Nextion string and '\\' escapes the next character;
+    # most titles contain neither, so test before copying.
+    if '"' in s or "\\" in s:
+        s = s.replace('"', "'").replace("\\", "/")
+    s = s.strip()
     if not s:
         s = "—"
     if len(s) > max_len:
@@ -88,100 +140,216 @@ def _fmt_ms(ms):
     m = (total % 3600) // 60
     s = total % 60
     if h > 0:
-        return "%d:%02d:%02d" % (h, m, s)
-    return "%d:%02d" % (m, s)
+        return str(h) + ":" + _D2[m] + ":" + _D2[s]
+    return str(m) + ":" + _D2[s]
+
+
+def _drain_uart(uart, scratch, rx, max_read, tag):
+    """Append up to max_read buffered UART bytes to rx; returns how many.
+
+    Reads land in the preallocated memoryview scratch first, so no bytes
+    object is created per read. A read error ends the drain; whatever
+    arrived before it stays in rx.
+    """
+    got = 0
+    try:
+        while got < max_read:
+            n = uart.in_waiting
+            if not n:
+                break
+            k = uart.readinto(scratch[: min(max_read - got, n, len(scratch))]) or 0
+            if not k:
+                break
+            rx.extend(scratch[:k])
+            got += k
+    except Exception as e:
+        dprint(tag, "read err:", e)
+    return got
 
 
 # ---------------- Nextion ----------------
+_NX_IDLE = ((), False)  # Nextion.read() result when nothing new arrived
+
+
 class Nextion:
+    TXQ_SIZE = 32
+    TX_FLUSH_MAX = 256  # bytes per tick; well under Nextion's 1 KiB serial buffer
+    RX_READ_MAX = 256
+    RX_DRAIN_MAX = 1024
+
     def __init__(self, uart):
         self.uart = uart
         self._rx = bytearray()
+        self._rx_pos = 0  # start of the first unconsumed byte in _rx
+        self._rx_drained = True  # no complete frame left in _rx
+        self._rx_scratch = memoryview(bytearray(self.RX_READ_MAX))  # for _drain_uart
 
         self.current_page = None
         self._last_sendme_at = 0.0
         self._sendme_period_s = 0.5
 
-        self._txq = []
+        # Fixed-size TX ring: no allocation per command, oldest dropped when full.
+        self._txq = [None] * self.TXQ_SIZE
+        self._txq_head = 0
+        self._txq_len = 0
         self._last_tx_at = 0.0
         self._tx_interval_s = 0.035
 
         self._last_token = None
         self._last_token_at = 0.0
 
+        self._txt_prefix = {}
+        self._txt_last = {}  # obj -> (txt, command bytes) last built for it
+        # Latest unsent text command per object; a newer value replaces a stale one.
+        self._txt_pending = {}
+        # obj -> command last written for it on this page; only the clocks are
+        # deduplicated against it, and it is forgotten every _repaint_period_s
+        self._txt_shown = {}
+        self._last_repaint_at = 0.0
+        self._repaint_period_s = 5.0
+
     def boot_sync(self, delay_s=0.8):
         time.sleep(delay_s)
         self._rx = bytearray()
-        self._txq.clear()
+        self._rx_pos = 0
+        self._rx_drained = True
+        self._txq_head = 0
+        self._txq_len = 0
+        self._txt_pending = {}
+        self._txt_shown = {}
         self.current_page = None
         self._last_sendme_at = 0.0
         self._last_tx_at = 0.0
-        self.enqueue("bkcmd=3")
-        self.enqueue("sendme")
+        self.enqueue(b"bkcmd=3")
+        self.enqueue(b"sendme")
 
     def enqueue(self, cmd):
-        self._txq.append(cmd)
-
-    def sendme_tick(self):
-        now = time.monotonic()
+        """Queue one command (bytes, without the terminator)."""
+        q = self._txq
+        size = self.TXQ_SIZE
+        head = self._txq_head
+        n = self._txq_len
+        if n and cmd == b"sendme" and q[(head + n - 1) % size] == cmd:
+            return  # the same poll is already waiting at the tail
+        if n == size:
+            q[head] = None
+            head = self._txq_head = (head + 1) % size
+            n -= 1
+        q[(head + n) % size] = cmd
+        self._txq_len = n + 1
+
+    def next_due(self):
+        """Monotonic time at which tick() next has work: a paced TX or a sendme poll."""
+        due = self._last_sendme_at + self._sendme_period_s
+        if self._txq_len or self._txt_pending:
+            due = min(due, self._last_tx_at + self._tx_interval_s)
+        return due
+
+    def sendme_tick(self, now):
         if (now - self._last_sendme_at) >= self._sendme_period_s:
             self._last_sendme_at = now
-            self.enqueue("sendme")
+            self.enqueue(b"sendme")
 
-    def tick(self):
-        self.sendme_tick()
+    def tick(self, now):
+        self.sendme_tick(now)
 
-        now = time.monotonic()
-        if not self._txq:
+        pending = self._txt_pending
+        if not self._txq_len and not pending:
             return
         if (now - self._last_tx_at) < self._tx_interval_s:
             return
 
-        cmd = self._txq.pop(0)
+        # Drain queued entries into one terminated write, up to TX_FLUSH_MAX
+        # bytes; the first entry always goes out even if it is larger.
+        q = self._txq
+        size = self.TXQ_SIZE
+        head = self._txq_head
+        n = self._txq_len
+        out = []
+        sent = []
+        budget = self.TX_FLUSH_MAX
+        while n and budget > 0:
+            cmd = q[head]
+            q[head] = None
+            head = (head + 1) % size
+            n -= 1
+            out.append(cmd)
+            budget -= len(cmd) + 3
+        self._txq_head = head
+        self._txq_len = n
+        # then pending text updates (order between objects doesn't matter)
+        shown = self._txt_shown
+        while pending and budget > 0:
+            item = pending.popitem()
+            sent.append(item)
+            shown[item[0]] = cmd = item[1]
+            out.append(cmd)
+            budget -= len(cmd) + 3
+        out.append(b"")
+        self._last_tx_at = now  # a failed write is retried paced, not every pass
         try:
-            self.uart.write(cmd.encode("ascii", "replace") + TERM)
-            self._last_tx_at = now
+            self.uart.write(TERM.join(out))
         except Exception as e:
+            # unknown what got through: forget what is on screen and retry the
+            # texts, unless a newer value for the same object is already queued
+            shown.clear()
+            for obj, cmd in sent:
+                if obj not in pending:
+                    pending[obj] = cmd
             dprint("[NX] write err:", e)
 
-    def _read_more(self):
-        try:
-            n = getattr(self.uart, "in_waiting", 0) or 0
-            chunk = self.uart.read(min(256, n)) if n else None
-        except Exception as e:
-            dprint("[NX] read err:", e)
-            return
-        if chunk:
-            self._rx.extend(chunk)
-
     def _pop_frame(self):
-        i = self._rx.find(TERM)
+        # Advance a cursor instead of reslicing _rx per frame; consumed bytes
+        # are dropped in one go once no complete frame is left.
+        pos = self._rx_pos
+        i = self._rx.find(TERM, pos)
         if i < 0:
+            # Drop consumed bytes only once everything is consumed (nothing to
+            # move) or the dead prefix gets large; otherwise keep the cursor.
+            if pos and (pos >= len(self._rx) or pos > RX_COMPACT_AT):
+                self._rx[:pos] = b""
+                self._rx_pos = 0
+            self._rx_drained = True
             return None
-        frame = bytes(self._rx[:i])
-        self._rx = self._rx[i + 3 :]
+        frame = bytes(self._rx[pos:i])
+        self._rx_pos = i + 3
         return frame
 
+    def _panel_reset(self):
+        # The panel rebooted (startup/ready frame): it is back on its default
+        # page with designer texts and bkcmd cleared, so start over.
+        self.current_page = None
+        self._txt_pending.clear()
+        self._txt_shown.clear()
+        self._last_sendme_at = 0.0
+        self.enqueue(b"bkcmd=3")
+
+    def repaint_due(self, now):
+        """True every _repaint_period_s: time to rewrite the whole current page.
+
+        Catches page reloads the 0.5 s sendme poll misses (a 1 -> 0 -> 1 flip
+        in between, an HMI-side ``page`` command).
+        """
+        if (now - self._last_repaint_at) < self._repaint_period_s:
+            return False
+        self._last_repaint_at = now
+        self._txt_shown.clear()
+        return True
+
     @staticmethod
     def _is_token_frame(frame):
-        f = frame.strip()
-        if not f:
-            return False
-        for b in f:
-            if 48 <= b <= 57:
-                continue
-            if 65 <= b <= 90:
-                continue
-            if b == 95:
-                continue
-            return False
-        return f in TOKENS
+        # Every token is [0-9A-Z_], so set membership alone validates the frame.
+        return frame.strip() in TOKENS
+
+    def read(self, now, max_tokens=6, debounce_s=0.10):
+        # Nothing new arrived and the last scan found no terminator: skip the scan.
+        got = _drain_uart(self.uart, self._rx_scratch, self._rx, self.RX_DRAIN_MAX, "[NX]")
+        if not got and self._rx_drained:
+            return _NX_IDLE
+        self._rx_drained = False
 
-    def read(self, max_tokens=6, debounce_s=0.10):
         tokens = []
         page_changed = False
-
-        self._read_more()
         while True:
             frame = self._pop_frame()
             if frame is None:
@@ -192,10 +360,18 @@ class Nextion:
                 if self.current_page != pageid:
                     self.current_page = pageid
                     page_changed = True
+                    # unsent texts target the old page's objects, and the new
+                    # page starts from its designed defaults
+                    self._txt_pending.clear()
+                    self._txt_shown.clear()
+                    self._last_repaint_at = now  # the caller flushes the page now
+                continue
+
+            if frame == b"\x88" or frame == b"\x00\x00\x00":
+                self._panel_reset()
                 continue
 
             if self._is_token_frame(frame):
-                now = time.monotonic()
                 if self._last_token == frame and (now - self._last_token_at) < debounce_s:
                     continue
                 self._last_token = frame
@@ -206,9 +382,38 @@ class Nextion:
 
         return tokens, page_changed
 
+    def _text_cmd(self, obj, txt):
+        # obj.txt="..." as bytes. Page refreshes resend mostly unchanged fields,
+        # so the last command per object is reused when its text is the same.
+        last = self._txt_last.get(obj)
+        if last is not None and last[0] == txt:
+            return last[1]
+        pre = self._txt_prefix.get(obj)
+        if pre is None:
+            pre = self._txt_prefix[obj] = (obj + '.txt="').encode("ascii")
+        cmd = pre + _sanitize_text(txt).encode("ascii", "replace") + b'"'
+        self._txt_last[obj] = (txt, cmd)
+        return cmd
+
+    def _set_text(self, obj, txt, dedupe=False):
+        cmd = self._text_cmd(obj, txt)
+        if dedupe and self._txt_shown.get(obj) == cmd:
+            # already on screen: nothing to send, and any queued value is stale
+            self._txt_pending.pop(obj, None)
+        else:
+            self._txt_pending[obj] = cmd
+
     def set_text_active_page(self, obj, txt):
-        safe = _sanitize_text(txt)
-        self.enqueue('%s.txt="%s"' % (obj, safe))
+        self._set_text(obj, txt)
+
+    def set_texts_active_page(self, items, dedupe=False):
+        """Set several (obj, txt) text fields; they go out with the next tick's write.
+
+        With dedupe, a field already showing the same text is not resent (for
+        the fast-moving clocks; everything else is always written).
+        """
+        for obj, txt in items:
+            self._set_text(obj, txt, dedupe)
 
 
 # ---------------- BLE HID ----------------
@@ -219,6 +424,9 @@ class BleHid:
         self._ble = None
         self._adv = None
         self._cc = None
+        self._vol_up = None
+        self._vol_dn = None
+        self._mute = None
         self._ready = False
         self._next_adv_at = 0.0
 
@@ -230,20 +438,24 @@ class BleHid:
             from adafruit_ble.advertising.standard import ProvideServicesAdvertisement
             from adafruit_ble.services.standard.hid import HIDService
             from adafruit_hid.consumer_control import ConsumerControl
+            from adafruit_hid.consumer_control_code import ConsumerControlCode as CCC
 
             self._ble = BLERadio()
             self._ble.name = self.name
             hid = HIDService()
             self._adv = ProvideServicesAdvertisement(hid)
             self._cc = ConsumerControl(hid.devices)
+            self._vol_up = CCC.VOLUME_INCREMENT
+            self._vol_dn = CCC.VOLUME_DECREMENT
+            self._mute = CCC.MUTE
             self._ready = True
             print("[BLE] Ready:", self.name)
-            self._start_adv(force=True)
+            self._start_adv(time.monotonic(), force=True)
         except Exception as e:
             print("[BLE] Disabled:", e)
             self._ready = False
 
-    def _start_adv(self, force=False):
+    def _start_adv(self, now, force=False):
         if not self._ready or not self._ble or not self._adv:
             return
         if self._ble.connected:
@@ -253,7 +465,6 @@ class BleHid:
                 return
         except Exception:
             pass
-        now = time.monotonic()
         if (not force) and now < self._next_adv_at:
             return
         try:
@@ -267,8 +478,8 @@ class BleHid:
             self._next_adv_at = now + 5.0
             dprint("[BLE] adv err:", e)
 
-    def tick(self):
-        self._start_adv(force=False)
+    def tick(self, now):
+        self._start_adv(now, force=False)
 
     def _send_ccc(self, code):
         if not self._ready or not self._ble or not self._cc:
@@ -281,12 +492,10 @@ class BleHid:
             print("[BLE] send fail:", e)
 
     def volume(self, up):
-        from adafruit_hid.consumer_control_code import ConsumerControlCode as CCC
-        self._send_ccc(CCC.VOLUME_INCREMENT if up else CCC.VOLUME_DECREMENT)
+        self._send_ccc(self._vol_up if up else self._vol_dn)
 
     def mute(self):
-        from adafruit_hid.consumer_control_code import ConsumerControlCode as CCC
-        self._send_ccc(CCC.MUTE)
+        self._send_ccc(self._mute)
 
 
 # ---------------- BM83 ----------------
@@ -315,29 +524,45 @@ class Bm83:
     MC_PLAY_PAUSE = 0x07
     MC_PREV = 0x0A
 
-    # EQ cycle (USER removed)
-    EQ_SEQ = (0, 1, 2, 3, 4, 5, 6, 7, 8, 9)
-    EQ_L = {
-        0: "OFF",
-        1: "SOFT",
-        2: "BASS",
-        3: "TREBLE",
-        4: "CLASSICAL",
-        5: "ROCK",
-        6: "JAZZ",
-        7: "POP",
-        8: "DANCE",
-        9: "RNB",
+    # EQ cycle (USER removed): EQ_NEXT[mode] is the mode after `mode`.
+    # OFF..RNB step forward and wrap; USER (0x0A/0x0B) falls back as if OFF.
+    EQ_NEXT = bytes((1, 2, 3, 4, 5, 6, 7, 8, 9, 0, 1, 1))
+    # Labels indexed by EQ mode (dense 0..11).
+    EQ_L = (
+        "OFF",
+        "SOFT",
+        "BASS",
+        "TREBLE",
+        "CLASSICAL",
+        "ROCK",
+        "JAZZ",
+        "POP",
+        "DANCE",
+        "RNB",
         # Some firmwares report USER as 0x0A; we won't cycle into it, but label it if seen.
-        10: "USER",
-        11: "USER",
-    }
+        "USER",
+        "USER",
+    )
 
     CONNECTED_STATES = (0x06, 0x0B, 0x82, 0x64, 0x65, 0x66)
 
+    # GetElementAttributes: title, artist, album, genre, track no., total tracks, playing time
+    GEA_ATTR_IDS = (1, 2, 3, 6, 4, 5, 7)
+    # Title, artist, album: players resend these unchanged with every response.
+    GEA_TEXT_ATTR_IDS = (1, 2, 3)
+    GEA_MAX_LEN = 2048  # cap on a reassembled GetElementAttributes response
+    GEA_REQ_PARAMS = bytes([len(GEA_ATTR_IDS)]) + b"".join(a.to_bytes(4, "big") for a in GEA_ATTR_IDS)
+
+    TX_BUF_SIZE = 64
+    RX_READ_MAX = 768
+    RX_DRAIN_MAX = 4096
+    # Longest body we accept; a larger length field is treated as line noise.
+    RX_FRAME_MAX_LEN = 1024
+
     def __init__(self, uart):
         self.uart = uart
         self._rx = bytearray()
+        self._rx_pos = 0  # start of the first unconsumed byte in _rx
 
         self.power_on = False
 
@@ -357,87 +582,162 @@ class Bm83:
 
         self._gea_frag = bytearray()
         self._gea_expect_len = None
+        self._gea_off = 0
+        self._gea_raw = {}  # GEA_TEXT_ATTR_IDS id -> raw value last returned
+
+        self._acks = {}
+        self._gea_req = {}
+        self._reg_pkts = {}
+        self._tx = bytearray(self.TX_BUF_SIZE)
+        self._txv = memoryview(self._tx)
+        self._rx_scratch = memoryview(bytearray(self.RX_READ_MAX))  # for _drain_uart
+
+        # Button and EQ commands never change: frame them once, write them as-is.
+        def fixed(op, *params):
+            return bytes(self._frame(op, bytes(params)))
+
+        mmi = self.OP_MMI_ACTION
+        self._pkt_power_on = (
+            fixed(mmi, 0x00, self.MMI_POWER_ON_PRESS),
+            fixed(mmi, 0x00, self.MMI_POWER_ON_RELEASE),
+        )
+        self._pkt_power_off = (
+            fixed(mmi, 0x00, self.MMI_POWER_OFF_PRESS),
+            fixed(mmi, 0x00, self.MMI_POWER_OFF_RELEASE),
+        )
+        self._pkt_pair = fixed(mmi, 0x00, self.MMI_ENTER_PAIRING)
+        self._pkt_play_pause = fixed(self.OP_MUSIC_CONTROL, 0x00, self.MC_PLAY_PAUSE)
+        self._pkt_prev = fixed(self.OP_MUSIC_CONTROL, 0x00, self.MC_PREV)
+        # Read BD address, unmask all events, connectable: sent as one burst
+        self._pkt_init_link = (
+            fixed(self.OP_READ_BD_ADDR)
+            + fixed(self.OP_EVENT_FILTER, 0x00, 0x00, 0x00, 0x00)
+            + fixed(self.OP_BTM_UTILITY_FUNC, 0x03, 0x01)
+        )
+        # SetEQ frame per mode, indexed by mode
+        self._pkt_eq = tuple(fixed(self.OP_EQ_MODE_SETTING, m, 0x00) for m in range(len(self.EQ_L)))
 
     @staticmethod
-    def _checksum(hi, lo, body):
-        return (-((hi + lo + sum(body)) & 0xFF)) & 0xFF
+    def _frame_into(pkt, op, params):
+        # Fill pkt in place instead of concatenating temporaries; returns the frame length.
+        n = len(params)
+        ln = n + 1
+        struct.pack_into(">BHB", pkt, 0, 0xAA, ln, op)
+        pkt[4 : 4 + n] = params
+        # sum() reduces in C. A @micropython.viper accumulator is not an option here:
+        # CircuitPython builds ship without the native emitters, and the decorator
+        # is rejected when code.py is compiled, so it can't be guarded with try/except.
+        pkt[4 + n] = (-((ln >> 8) + (ln & 0xFF) + op + sum(params))) & 0xFF
+        return n + 5
 
     def _frame(self, op, params=b""):
-        body = bytes([op]) + params
-        ln = len(body)
-        hi, lo = (ln >> 8) & 0xFF, ln & 0xFF
-        chk = self._checksum(hi, lo, body)
-        return bytes([0xAA, hi, lo]) + body + bytes([chk])
-
-    def send(self, op, params=b""):
-        pkt = self._frame(op, params)
-        dprint("[BM83 TX]", " ".join("%02X" % b for b in pkt))
+        pkt = bytearray(len(params) + 5)
+        self._frame_into(pkt, op, params)
+        return pkt
+
+    def _packet(self, op, params):
+        if len(params) + 5 <= self.TX_BUF_SIZE:
+            # reuse the TX scratch buffer; the caller writes or copies it out right away
+            return self._txv[: self._frame_into(self._tx, op, params)]
+        return self._frame(op, params)
+
+    def _write(self, pkt):
+        if DEBUG:
+            # checked here, not in dprint, so hexdump isn't built when off
+            print("[BM83 TX]", hexdump(pkt))
         try:
             self.uart.write(pkt)
         except Exception as e:
             print("[BM83] write err:", e)
 
+    def send(self, op, params=b""):
+        self._write(self._packet(op, params))
+
     def ack_event(self, event_op):
         if event_op == 0x00:
             return
-        self.send(self.OP_EVENT_ACK, bytes([event_op & 0xFF]))
+        # Every received event is ACKed; keep one ready-made frame per event opcode.
+        pkt = self._acks.get(event_op)
+        if pkt is None:
+            pkt = self._acks[event_op] = bytes(self._frame(self.OP_EVENT_ACK, bytes([event_op & 0xFF])))
+        self._write(pkt)
 
-    def poll(self, max_read=768):
+    def poll(self, max_read=RX_DRAIN_MAX):
         out = []
-        try:
-            n = getattr(self.uart, "in_waiting", 0) or 0
-            chunk = self.uart.read(min(max_read, n)) if n else None
-        except Exception as e:
-            dprint("[BM83] read err:", e)
-            return out
-
-        if chunk:
-            self._rx.extend(chunk)
-
-        while True:
-            if len(self._rx) < 4:
-                break
-            sof = self._rx.find(b"\xAA")
+        # Drain everything the UART has buffered (up to max_read) before decoding,
+        # so a metadata burst is parsed in one pass instead of one read per loop.
+        _drain_uart(self.uart, self._rx_scratch, self._rx, max_read, "[BM83]")
+
+        # Walk an offset through the buffer from the persistent cursor; the
+        # consumed prefix is only dropped when it's everything or grows large.
+        buf = self._rx
+        mv = memoryview(buf)
+        # hoist lookups out of the loop (each is a dict probe on CircuitPython)
+        find = buf.find
+        unpack_from = struct.unpack_from
+        max_len = self.RX_FRAME_MAX_LEN
+        emit = out.append
+        end = len(buf)
+        off = self._rx_pos
+        while end - off >= 4:
+            sof = find(b"\xAA", off)
             if sof < 0:
-                self._rx.clear()
+                off = end
                 break
-            if sof > 0:
-                self._rx = self._rx[sof:]
-            if len(self._rx) < 4:
+            off = sof
+            if end - off < 4:
                 break
 
-            hi, lo = self._rx[1], self._rx[2]
-            ln = (hi << 8) | lo
+            ln = unpack_from(">H", buf, off + 1)[0]
+            if not 0 < ln <= max_len:
+                # corrupt length (an event always carries its opcode, so never 0):
+                # resync on the next 0xAA instead of waiting for ln bytes
+                off += 1
+                continue
             total = 3 + ln + 1
-            if len(self._rx) < total:
+            if end - off < total:
                 break
 
-            body = bytes(self._rx[3 : 3 + ln])
-            chk = self._rx[3 + ln]
-            if chk != self._checksum(hi, lo, body):
-                self._rx = self._rx[1:]
+            # Length, body and checksum byte must sum to zero (mod 256);
+            # sum over a view so the body is only copied once it is valid.
+            if sum(mv[off + 1 : off + total]) & 0xFF:
+                # bad frame: resync on the next 0xAA (a real frame may start inside it)
+                off += 1
                 continue
 
-            op = body[0]
-            params = body[1:]
-            dprint(
-                "[BM83 EVT] op=0x%02X len=%d data=" % (op, len(params)),
-                " ".join("%02X" % b for b in params),
-            )
-            out.append((op, params))
-            self._rx = self._rx[total:]
+            op = buf[off + 3]
+            params = bytes(mv[off + 4 : off + 3 + ln])
+            if DEBUG:
+                print(
+                    "[BM83 EVT] op=0x%02X len=%d data=" % (op, len(params)),
+                    hexdump(params),
+                )
+            emit((op, params))
+            off += total
+
+        del mv  # release the view before resizing the buffer
+        if off and (off >= end or off > RX_COMPACT_AT):
+            buf[:off] = b""  # slice assignment: del on a slice isn't in every port
+            off = 0
+        self._rx_pos = off
 
         return out
 
     def init_link(self):
-        self.send(self.OP_READ_BD_ADDR)
-        self.send(self.OP_EVENT_FILTER, b"\x00\x00\x00\x00")
-        self.send(self.OP_BTM_UTILITY_FUNC, b"\x03\x01")
+        self._write(self._pkt_init_link)
         print("[BM83] Link initialized")
 
     # EQ helpers (EQ FIX)
     def set_eq(self, mode):
-        self.send(self.OP_EQ_MODE_SETTING, bytes([mode & 0xFF, 0x00]))
+        mode &= 0xFF
+        if mode < len(self._pkt_eq):
+            self._write(self._pkt_eq[mode])
+        else:
+            self.send(self.OP_EQ_MODE_SETTING, bytes([mode, 0x00]))
+
+    @classmethod
+    def eq_label(cls, mode):
+        return cls.EQ_L[mode] if 0 <= mode < len(cls.EQ_L) else "OFF"
 
     def set_eq_off(self):
         self.set_eq(0)
@@ -449,20 +749,19 @@ class Bm83:
         not a local counter that can drift.
         """
         cur = self.current_eq_mode
-        try:
-            i = self.EQ_SEQ.index(cur)
-        except ValueError:
-            i = 0  # if BM83 reports something odd (like USER), fall back gracefully
-        nxt = self.EQ_SEQ[(i + 1) % len(self.EQ_SEQ)]
+        if not 0 <= cur < len(self.EQ_NEXT):
+            cur = 0  # if BM83 reports something odd, fall back gracefully
+        nxt = self.EQ_NEXT[cur]
         self.set_eq(nxt)
         # Optimistically update; BM83 will also confirm via EQ_MODE_IND
         self.current_eq_mode = nxt
         return nxt
 
     def power_on_cmd(self):
-        self.send(self.OP_MMI_ACTION, bytes([0x00, self.MMI_POWER_ON_PRESS]))
+        press, release = self._pkt_power_on
+        self._write(press)
         time.sleep(0.2)
-        self.send(self.OP_MMI_ACTION, bytes([0x00, self.MMI_POWER_ON_RELEASE]))
+        self._write(release)
         time.sleep(0.5)
         self.init_link()
 
@@ -474,9 +773,10 @@ class Bm83:
         print("[POWER] ON (UART)")
 
     def power_off_cmd(self):
-        self.send(self.OP_MMI_ACTION, bytes([0x00, self.MMI_POWER_OFF_PRESS]))
+        press, release = self._pkt_power_off
+        self._write(press)
         time.sleep(1.5)
-        self.send(self.OP_MMI_ACTION, bytes([0x00, self.MMI_POWER_OFF_RELEASE]))
+        self._write(release)
         self.power_on = False
         self.connected = False
         print("[POWER] OFF (UART)")
@@ -485,19 +785,18 @@ class Bm83:
         self.power_off_cmd() if self.power_on else self.power_on_cmd()
 
     def pair(self):
-        self.send(self.OP_MMI_ACTION, bytes([0x00, self.MMI_ENTER_PAIRING]))
+        self._write(self._pkt_pair)
         print("[PAIR] Enter pairing")
 
     def play_pause(self):
-        self.send(self.OP_MUSIC_CONTROL, bytes([0x00, self.MC_PLAY_PAUSE]))
+        self._write(self._pkt_play_pause)
         print("[PLAY/PAUSE] toggled")
 
     def prev(self):
-        self.send(self.OP_MUSIC_CONTROL, bytes([0x00, self.MC_PREV]))
+        self._write(self._pkt_prev)
         print("[PREV] triggered")
 
-    def note_btm_state(self, state):
-        now = time.monotonic()
+    def note_btm_state(self, state, now):
         if state in self.CONNECTED_STATES:
             self._last_connected_seen = now
             if not self.connected:
@@ -516,29 +815,51 @@ class Bm83:
     def avrcp_get_play_status(self, db=0):
         self.send(self.OP_AVC_VENDOR_CMD, bytes([db]) + self._avc_payload(0x30, b""))
 
+    def _notification_pkt(self, event_id, interval_s=0, db=0):
+        # Only a handful of (event, interval) pairs are ever registered; frame each once.
+        key = (event_id, interval_s, db)
+        pkt = self._reg_pkts.get(key)
+        if pkt is None:
+            params = bytes([event_id]) + int(interval_s).to_bytes(4, "big")
+            params = bytes([db]) + self._avc_payload(0x31, params)
+            pkt = self._reg_pkts[key] = bytes(self._frame(self.OP_AVC_VENDOR_CMD, params))
+        return pkt
+
     def avrcp_register_notification(self, event_id, interval_s=0, db=0):
-        params = bytes([event_id]) + int(interval_s).to_bytes(4, "big")
-        self.send(self.OP_AVC_VENDOR_CMD, bytes([db]) + self._avc_payload(0x31, params))
+        self._write(self._notification_pkt(event_id, interval_s, db))
+
+    def avrcp_register_notifications(self, events, db=0):
+        """Register several (event_id, interval_s) notifications with one UART write."""
+        self._write(b"".join([self._notification_pkt(event_id, interval_s, db) for event_id, interval_s in events]))
 
     def avrcp_get_element_attributes(self, db=0):
-        attr_ids = (1, 2, 3, 6, 4, 5, 7)
-        p = bytes([len(attr_ids)])
-        for a in attr_ids:
-            p += int(a).to_bytes(4, "big")
-        self.send(self.OP_AVRCP_VENDOR_DEP_CMD, bytes([db, 0x20]) + p)
-
-    def schedule_attrs(self, delay_s=0.35):
-        now = time.monotonic()
+        # The request never changes for a given db; frame it once and reuse it.
+        pkt = self._gea_req.get(db)
+        if pkt is None:
+            params = bytes([db, 0x20]) + self.GEA_REQ_PARAMS
+            pkt = self._gea_req[db] = bytes(self._frame(self.OP_AVRCP_VENDOR_DEP_CMD, params))
+        # a new response is coming: drop what is left of one that never ended
+        self._gea_reset()
+        self._write(pkt)
+
+    def schedule_attrs(self, now, delay_s=0.35):
         if (now - self._last_attrs_req_at) < self._attrs_throttle_s:
             return
         t = now + delay_s
         if self._next_attrs_at == 0.0 or t < self._next_attrs_at:
             self._next_attrs_at = t
 
-    def tick_avrcp(self):
+    def next_due(self):
+        """Monotonic time at which tick_avrcp() next has work, or None while disconnected."""
+        if not self.connected:
+            return None
+        if self._next_attrs_at:
+            return min(self._next_playstatus_at, self._next_attrs_at)
+        return self._next_playstatus_at
+
+    def tick_avrcp(self, now):
         if not self.connected:
             return
-        now = time.monotonic()
         if now >= self._next_playstatus_at:
             self.avrcp_get_play_status(0)
             self._next_playstatus_at = now + self._playstatus_period_s
@@ -551,56 +872,124 @@ class Bm83:
     def parse_avc_vendor_rsp(params):
         if len(params) < 1 + 10:
             return None
+        # index into params directly; only the returned payload is copied
         db = params[0]
-        p = params[1:]
-        pdu = p[6]
-        pkt_type = p[7]
-        plen = int.from_bytes(p[8:10], "big")
-        if len(p) < 10 + plen:
+        pdu = params[7]
+        pkt_type = params[8]
+        plen = struct.unpack_from(">H", params, 9)[0]
+        if len(params) < 11 + plen:
             return None
-        return db, pdu, pkt_type, p[10 : 10 + plen]
+        return db, pdu, pkt_type, params[11 : 11 + plen]
+
+    def _gea_reset(self):
+        self._gea_frag = bytearray()
+        self._gea_expect_len = None
+        self._gea_off = 0
 
     def parse_gea_0x5d(self, params):
-        if len(params) < 2:
+        # params: pdu_id, ?, resp, is_end, attr_num, total_len(2), fragment...
+        if len(params) < 7 or params[0] != 0x20:
             return None
-        pdu_id = params[0]
-        payload = params[2:]
-        if pdu_id != 0x20 or len(payload) < 5:
-            return None
-
-        resp = payload[0]
-        is_end = payload[1]
-        attr_num = payload[2]
-        total_len = int.from_bytes(payload[3:5], "big")
-        part = payload[5:]
 
-        if self._gea_expect_len is None:
+        resp = params[2]
+        is_end = params[3]
+        attr_num = params[4]
+        total_len = struct.unpack_from(">H", params, 5)[0]
+        n = len(params) - 7
+
+        expect = self._gea_expect_len
+        if expect is not None and self._gea_off + n > expect:
+            # More bytes than the response in progress advertised: its end
+            # fragment was lost, so this one starts the next response.
+            dprint("[GEA] dropping stale fragments:", self._gea_off, "of", expect)
+            self._gea_reset()
+            expect = None
+        if expect is None:
+            # One allocation sized to the advertised total (capped), then copy
+            # each fragment into place; anything past the cap is dropped.
             self._gea_expect_len = total_len
-            self._gea_frag = bytearray()
-        self._gea_frag.extend(part)
+            self._gea_frag = bytearray(min(total_len, self.GEA_MAX_LEN))
+            self._gea_off = 0
+        off = self._gea_off
+        k = min(n, len(self._gea_frag) - off)
+        if k > 0:
+            self._gea_frag[off : off + k] = memoryview(params)[7 : 7 + k]
+        self._gea_off = off + n  # received so far, including bytes past the cap
 
         if is_end != 0x01:
             return None
+        attrs = self._gea_attrs(attr_num)
+        self._gea_reset()
+        return resp, attrs
 
-        full = bytes(self._gea_frag[: self._gea_expect_len])
-        self._gea_frag = bytearray()
-        self._gea_expect_len = None
+    def _gea_attrs(self, attr_num):
+        # Walk the reassembled TLVs (aid:4, charset:2, len:2, value) in place;
+        # only each value is copied out for decoding.
+        frag = self._gea_frag
+        flen = min(self._gea_off, len(frag))
+        full = memoryview(frag)[:flen]
+        unpack_from = struct.unpack_from
+        text_ids = self.GEA_TEXT_ATTR_IDS
+        last_raw = self._gea_raw
 
         attrs = {}
         idx = 0
         for _ in range(attr_num):
-            if idx + 8 > len(full):
+            if idx + 8 > flen:
                 break
-            aid = int.from_bytes(full[idx : idx + 4], "big")
-            vlen = int.from_bytes(full[idx + 6 : idx + 8], "big")
-            val = full[idx + 8 : idx + 8 + vlen]
+            aid, _charset, vlen = unpack_from(">IHH", frag, idx)
+            val = bytes(full[idx + 8 : idx + 8 + vlen])
             idx += 8 + vlen
+            if aid in text_ids:
+                # unchanged title/artist/album: left out, nothing to decode or redraw
+                if last_raw.get(aid) == val:
+                    continue
+                last_raw[aid] = val
+            # CPython never raises here with errors="replace", but CircuitPython
+            # ignores the errors argument and raises on invalid UTF-8, so the
+            # byte-wise fallback is still needed on-device.
             try:
                 s = val.decode("utf-8", "replace").strip()
-            except Exception:
+            except UnicodeError:
                 s = "".join(chr(b) if 32 <= b <= 126 else " " for b in val).strip()
             attrs[aid] = s
-        return resp, attrs
+
+        del full
+        return attrs
+
+
+# ---------------- Idle wait ----------------
+class UartWaiter:
+    """While idle, block on the UARTs instead of sleeping blind so a byte wakes
+    the loop at once. Not every build has select (or pollable UARTs): then
+    wait() just sleeps."""
+
+    def __init__(self, *uarts):
+        self.poller = None
+        try:
+            import select
+
+            poller = select.poll()
+            for uart in uarts:
+                poller.register(uart, select.POLLIN)
+            self.poller = poller
+        except Exception as e:
+            dprint("[MAIN] select unavailable:", e)
+
+    def wait(self, timeout_s):
+        if self.poller is not None:
+            # poll() takes whole ms: round up, or a sub-ms wait would spin as poll(0)
+            ms = timeout_s * 1000
+            poll_ms = int(ms)
+            if poll_ms < ms:
+                poll_ms += 1
+            try:
+                self.poller.poll(poll_ms)
+                return
+            except Exception as e:
+                dprint("[MAIN] poll err:", e)
+                self.poller = None
+        time.sleep(timeout_s)
 
 
 # ---------------- Main ----------------
@@ -621,7 +1010,8 @@ def main():
     nx.boot_sync(0.9)
 
     desired_eq = "OFF"
-    desired_meta = {k: "—" for k in NX_RUNTIME.keys()}
+    # Full-shape from the start: every NX_RUNTIME key is always present.
+    desired_meta = dict.fromkeys(NX_RUNTIME, "—")
 
     # Play-status based track-change detection
     last_pos_ms = None
@@ -635,9 +1025,21 @@ def main():
         if pageid == 0:
             nx.set_text_active_page(EQ_OBJ_PAGE0, desired_eq)
         elif pageid == 1:
-            nx.set_text_active_page(EQ_OBJ_PAGE1, desired_eq)
-            for k, obj in NX_RUNTIME.items():
-                nx.set_text_active_page(obj, desired_meta.get(k, "—"))
+            items = [(EQ_OBJ_PAGE1, desired_eq)]
+            items.extend((obj, desired_meta[k]) for k, obj in NX_RUNTIME_FIELDS)
+            nx.set_texts_active_page(items)
+
+    def set_meta(key, txt):
+        # True if the text for key actually changed.
+        if desired_meta[key] == txt:
+            return False
+        desired_meta[key] = txt
+        return True
+
+    def flush_times():
+        # Position ticks only move the clocks; don't resend title/artist/etc.
+        if nx.current_page == 1:
+            nx.set_texts_active_page([(obj, desired_meta[k]) for k, obj in NX_TIME_FIELDS], True)
 
     def maybe_track_changed(pos_ms, total_ms):
         nonlocal last_pos_ms, last_total_ms
@@ -662,140 +1064,199 @@ def main():
         last_total_ms = total_ms
         return changed
 
-    last_gc = time.monotonic()
+    def on_btm_status(params, now):
+        if not params:
+            return
+        state = params[0]
+        dprint("[BTM_Status] state=", state)
+        change = bm.note_btm_state(state, now)
+        if change == "CONNECTED":
+            print("[BTM] Connected -> register notifications + request metadata")
+            bm.avrcp_register_notifications(
+                (
+                    (0x01, 1),  # play status
+                    (0x02, 0),  # track changed
+                    (0x05, 1),  # pos changed
+                )
+            )
+            bm._next_playstatus_at = 0.0
+            bm.schedule_attrs(now, 0.8)
+
+    def apply_eq(mode):
+        # Shared tail of EQ changes from BM83 and from the panel: label + redraw.
+        nonlocal desired_eq
+        desired_eq = bm.eq_label(mode)
+        if nx.current_page is not None:
+            flush_page(nx.current_page)
+
+    def on_eq_mode(params, now):
+        if not params:
+            return
+        mode = params[0]
+
+        # EQ FIX: keep our EQ state synced to BM83
+        bm.current_eq_mode = mode
+
+        apply_eq(mode)
+        dprint("[EQ_IND] mode=", mode, "label=", desired_eq)
+
+    def on_avc_vendor_rsp(params, now):
+        parsed = bm.parse_avc_vendor_rsp(params)
+        if not parsed:
+            return
+        _db, pdu, pkt_type, avp = parsed
+        if pkt_type != 0x00:
+            return
+
+        if pdu == 0x30 and len(avp) >= 9:
+            # song length, song position (ms), then play status
+            total_ms, pos_ms = struct.unpack_from(">II", avp)
+
+            changed = set_meta("time_cur", _fmt_ms(pos_ms))
+            if total_ms > 0:
+                changed = set_meta("time", _fmt_ms(total_ms)) or changed
+
+            if maybe_track_changed(pos_ms, total_ms):
+                dprint("[TRACK] inferred change -> request metadata")
+                bm.schedule_attrs(now, 0.25)
+
+            if changed:
+                flush_times()
+
+        elif pdu == 0x31 and len(avp) >= 1:
+            # Keep this (some stacks do send TrackChanged reliably)
+            event_id = avp[0]
+            if event_id == 0x02:
+                dprint("[AVRCP] TrackChanged -> request metadata")
+                bm.schedule_attrs(now, 0.25)
+                # Re-register so future notifications keep coming
+                bm.avrcp_register_notification(0x02, interval_s=0)
+            elif event_id == 0x05 and len(avp) >= 5:
+                pos = struct.unpack_from(">I", avp, 1)[0]
+                if set_meta("time_cur", _fmt_ms(pos)):
+                    flush_times()
+
+    def on_element_attrs(params, now):
+        gea = bm.parse_gea_0x5d(params)
+        if not gea:
+            return
+        _resp, attrs = gea
+        if DEBUG:
+            print("[META] GetElementAttributes received:", sorted(attrs.keys()))
+
+        changed = False
+        for aid, val in attrs.items():
+            dst = AVRCP_ATTR_KEYS.get(aid)
+            if dst is not None:
+                changed = set_meta(dst[0], _sanitize_text(val, max_len=dst[1])) or changed
+            elif aid == AVRCP_ATTR_PLAYING_TIME:
+                changed = set_meta("time", _fmt_ms(val)) or changed
+
+        if changed and nx.current_page == 1:
+            flush_page(1)
+
+    # BM83 event opcode -> handler(params, now); other events are only ACKed.
+    event_handlers = {
+        Bm83.EVT_BTM_STATUS: on_btm_status,
+        Bm83.EVT_EQ_MODE_IND: on_eq_mode,
+        Bm83.EVT_AVC_VENDOR_RSP: on_avc_vendor_rsp,
+        Bm83.EVT_AVRCP_VENDOR_DEP_RSP: on_element_attrs,
+    }
+
+    def on_next_eq(now):
+        apply_eq(bm.next_eq())
+        print("[EQ] set to", desired_eq)
+
+    def on_vol_down(now):
+        nonlocal last_voldn_at
+        if (now - last_voldn_at) <= mute_window_s:
+            ble.mute()
+            last_voldn_at = 0.0
+        else:
+            ble.volume(False)
+            last_voldn_at = now
+
+    # Nextion token -> handler(now); tokens without an entry are ignored.
+    token_handlers = {
+        b"BT_POWER": lambda now: bm.power_toggle(),
+        b"BT_PAIR": lambda now: bm.pair(),
+        b"BT_PLAY": lambda now: bm.play_pause(),
+        b"BT_PREV": lambda now: bm.prev(),
+        b"BT_NEXT": on_next_eq,
+        b"BT_VOLUP": lambda now: ble.volume(True),
+        b"BT_VOLDN": on_vol_down,
+    }
+
+    waiter = UartWaiter(bm_uart, nx_uart)
+
+    # Per-iteration lookups bound to locals once (module/dict attribute loads otherwise).
+    monotonic = time.monotonic
+    event_handler = event_handlers.get
+    token_handler = token_handlers.get
+    nx_tick = nx.tick
+    nx_read = nx.read
+    nx_repaint_due = nx.repaint_due
+    ble_tick = ble.tick
+    bm_tick = bm.tick_avrcp
+    bm_poll = bm.poll
+    bm_ack = bm.ack_event
+    idle_wait = waiter.wait
+
+    last_gc = monotonic()
+    last_work_at = last_gc
+    idle_after_s = 0.2
+    gc_period_s = 8.0
+    # Longest idle wait when polling the UARTs (bounds BLE advertising retries).
+    idle_max_s = 0.1
 
     while True:
-        now = time.monotonic()
+        now = monotonic()
 
-        if now - last_gc > 8.0:
+        if now - last_gc > gc_period_s:
             gc.collect()
             last_gc = now
 
-        nx.tick()
-        tokens, page_changed = nx.read()
+        nx_tick(now)
+        tokens, page_changed = nx_read(now)
 
         if page_changed and nx.current_page is not None:
             dprint("[NX] page=", nx.current_page)
             flush_page(nx.current_page)
+        elif nx_repaint_due(now) and nx.current_page is not None:
+            flush_page(nx.current_page)
 
-        ble.tick()
-
-        bm.tick_avrcp()
-        for op, params in bm.poll():
-            bm.ack_event(op)
-
-            if op == bm.EVT_BTM_STATUS and params:
-                state = params[0]
-                print("[BTM_Status] state=0x%02X" % state)
-                change = bm.note_btm_state(state)
-                if change == "CONNECTED":
-                    print("[BTM] Connected -> register notifications + request metadata")
-                    bm.avrcp_register_notification(0x01, interval_s=1)  # play status
-                    bm.avrcp_register_notification(0x02, interval_s=0)  # track changed
-                    bm.avrcp_register_notification(0x05, interval_s=1)  # pos changed
-                    bm._next_playstatus_at = 0.0
-                    bm.schedule_attrs(0.8)
-
-            elif op == bm.EVT_EQ_MODE_IND and params:
-                mode = params[0]
-
-                # EQ FIX: keep our EQ state synced to BM83
-                bm.current_eq_mode = mode if mode is not None else bm.current_eq_mode
-
-                desired_eq = bm.EQ_L.get(mode, "OFF")
-                dprint("[EQ_IND] mode=%d label=%s" % (mode, desired_eq))
-                if nx.current_page is not None:
-                    flush_page(nx.current_page)
-
-            elif op == bm.EVT_AVC_VENDOR_RSP:
-                parsed = bm.parse_avc_vendor_rsp(params)
-                if not parsed:
-                    continue
-                _db, pdu, pkt_type, avp = parsed
-                if pkt_type != 0x00:
-                    continue
+        ble_tick(now)
+
+        bm_tick(now)
+        events = bm_poll()
+        for op, params in events:
+            bm_ack(op)
 
-                if pdu == 0x30 and len(avp) >= 9:
-                    total_ms = int.from_bytes(avp[0:4], "big")
-                    pos_ms = int.from_bytes(avp[4:8], "big")
-
-                    desired_meta["time_cur"] = _fmt_ms(pos_ms)
-                    if total_ms > 0:
-                        desired_meta["time"] = _fmt_ms(total_ms)
-
-                    if maybe_track_changed(pos_ms, total_ms):
-                        dprint("[TRACK] inferred change -> request metadata")
-                        bm.schedule_attrs(0.25)
-
-                    if nx.current_page == 1:
-                        flush_page(1)
-
-                elif pdu == 0x31 and len(avp) >= 1:
-                    # Keep this (some stacks do send TrackChanged reliably)
-                    event_id = avp[0]
-                    if event_id == 0x02:
-                        dprint("[AVRCP] TrackChanged -> request metadata")
-                        bm.schedule_attrs(0.25)
-                        # Re-register so future notifications keep coming
-                        bm.avrcp_register_notification(0x02, interval_s=0)
-                    elif event_id == 0x05 and len(avp) >= 5:
-                        pos = int.from_bytes(avp[1:5], "big")
-                        desired_meta["time_cur"] = _fmt_ms(pos)
-                        if nx.current_page == 1:
-                            flush_page(1)
-
-            elif op == bm.EVT_AVRCP_VENDOR_DEP_RSP:
-                gea = bm.parse_gea_0x5d(params)
-                if gea:
-                    _resp, attrs = gea
-                    print("[META] GetElementAttributes received:", sorted(attrs.keys()))
-
-                    if 1 in attrs:
-                        desired_meta["title"] = _sanitize_text(attrs[1])
-                    if 2 in attrs:
-                        desired_meta["artist"] = _sanitize_text(attrs[2])
-                    if 3 in attrs:
-                        desired_meta["album"] = _sanitize_text(attrs[3])
-                    if 6 in attrs:
-                        desired_meta["genre"] = _sanitize_text(attrs[6])
-                    if 4 in attrs:
-                        desired_meta["track_num"] = _sanitize_text(attrs[4], max_len=8)
-                    if 5 in attrs:
-                        desired_meta["total_tracks"] = _sanitize_text(attrs[5], max_len=8)
-                    if 7 in attrs:
-                        desired_meta["time"] = _fmt_ms(attrs[7])
-
-                    if nx.current_page == 1:
-                        flush_page(1)
+            handler = event_handler(op)
+            if handler is not None:
+                handler(params, now)
 
         for tok in tokens:
             dprint("[NX] Token:", tok)
 
-            if tok == b"BT_POWER":
-                bm.power_toggle()
-            elif tok == b"BT_PAIR":
-                bm.pair()
-            elif tok == b"BT_PLAY":
-                bm.play_pause()
-            elif tok == b"BT_PREV":
-                bm.prev()
-            elif tok == b"BT_NEXT":
-                mode = bm.next_eq()
-                desired_eq = bm.EQ_L.get(mode, "OFF")
-                print("[EQ] set to", desired_eq)
-                if nx.current_page is not None:
-                    flush_page(nx.current_page)
-            elif tok == b"BT_VOLUP":
-                ble.volume(True)
-            elif tok == b"BT_VOLDN":
-                if (now - last_voldn_at) <= mute_window_s:
-                    ble.mute()
-                    last_voldn_at = 0.0
-                else:
-                    ble.volume(False)
-                    last_voldn_at = now
-
-        time.sleep(0.005)
+            handler = token_handler(tok)
+            if handler is not None:
+                handler(now)
+
+        # Spin again straight away while there is traffic; back off once idle.
+        if tokens or events or page_changed:
+            last_work_at = now
+        elif (now - last_work_at) < idle_after_s:
+            idle_wait(0.002)
+        elif waiter.poller is not None:
+            # Input wakes the poll anyway, so stay idle until the next timed job.
+            due = min(nx.next_due(), last_gc + gc_period_s)
+            bm_due = bm.next_due()
+            if bm_due is not None and bm_due < due:
+                due = bm_due
+            idle_wait(min(max(due - now, 0.0), idle_max_s))
+        else:
+            idle_wait(0.020)
 
 
 main()
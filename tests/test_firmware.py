@@ -0,0 +1,493 @@
+# Behaviour tests for firmware/circuitpython/code.py
+#
+# board/busio are stubbed just long enough to load code.py; the BM83 and
+# Nextion classes then run against a fake UART fed with raw byte streams.
+
+from __future__ import annotations
+
+import re
+import struct
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+FIRMWARE_DIR = Path(__file__).parent.parent / "firmware" / "circuitpython"
+
+
+class FakeUart:
+    """busio.UART stand-in: bytes to read are fed in, writes are recorded."""
+
+    def __init__(self, *args, **kwargs):
+        self.rx = bytearray()
+        self.writes = []
+
+    def feed(self, data):
+        self.rx.extend(data)
+
+    @property
+    def in_waiting(self):
+        return len(self.rx)
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self.rx))
+        if not n:
+            return None
+        buf[:n] = self.rx[:n]
+        del self.rx[:n]
+        return n
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+        return len(data)
+
+
+def _load_firmware():
+    board = types.ModuleType("board")
+    for pin in ("IO15", "IO16", "IO17", "IO18"):
+        setattr(board, pin, pin)
+    busio = types.ModuleType("busio")
+    busio.UART = FakeUart
+
+    saved = {name: sys.modules.get(name) for name in ("board", "busio")}
+    sys.modules["board"] = board
+    sys.modules["busio"] = busio
+    try:
+        src = (FIRMWARE_DIR / "code.py").read_text(encoding="utf-8")
+        # code.py ends by calling main(), which never returns
+        src = re.sub(r"\nmain\(\)\s*$", "\n", src)
+        module = types.ModuleType("bt_firmware")
+        exec(compile(src, str(FIRMWARE_DIR / "code.py"), "exec"), module.__dict__)
+    finally:
+        for name, mod in saved.items():
+            if mod is None:
+                del sys.modules[name]
+            else:
+                sys.modules[name] = mod
+    return module
+
+
+fw = _load_firmware()
+TERM = fw.TERM
+
+
+def bm83_frame(op, params=b""):
+    """Reference BM83 frame: 0xAA, len(2), op, params, checksum."""
+    ln = len(params) + 1
+    body = bytes([ln >> 8, ln & 0xFF, op]) + bytes(params)
+    return b"\xAA" + body + bytes([-sum(body) & 0xFF])
+
+
+@pytest.fixture
+def bm():
+    return fw.Bm83(FakeUart())
+
+
+@pytest.fixture
+def nx():
+    panel = fw.Nextion(FakeUart())
+    panel._sendme_period_s = 1e9  # keep the sendme poll out of the way
+    return panel
+
+
+def sent_commands(uart):
+    """Every command written to the Nextion, in order, without terminators."""
+    data = b"".join(uart.writes)
+    assert data.endswith(TERM)
+    return data[: -len(TERM)].split(TERM)
+
+
+# ---------------------------------------------------------------------------
+#  _sanitize_text / _fmt_ms
+# ---------------------------------------------------------------------------
+
+
+def test_sanitize_text_plain():
+    """Printable ASCII passes through, stripped."""
+    assert fw._sanitize_text("  Hello World ") == "Hello World"
+
+
+def test_sanitize_text_empty_and_none():
+    """None and blank text show as a dash."""
+    assert fw._sanitize_text(None) == "—"
+    assert fw._sanitize_text("") == "—"
+    assert fw._sanitize_text(" \t\n") == "—"
+
+
+def test_sanitize_text_non_printable():
+    """Control and non-ASCII characters become spaces."""
+    assert fw._sanitize_text("a\tb\nc") == "a b c"
+    assert fw._sanitize_text("Beyoncé") == "Beyonc"
+    assert fw._sanitize_text("Café del Mar") == "Caf  del Mar"
+
+
+def test_sanitize_text_quotes_and_backslash():
+    """Characters that would break a Nextion string literal are replaced."""
+    assert fw._sanitize_text('say "hi"') == "say 'hi'"
+    assert fw._sanitize_text("AC\\DC") == "AC/DC"
+
+
+def test_sanitize_text_truncates():
+    """Long text is cut to max_len with an ellipsis."""
+    out = fw._sanitize_text("x" * 60, max_len=10)
+    assert out == "x" * 9 + "…"
+    assert len(out) == 10
+
+
+def test_fmt_ms_minutes_seconds():
+    assert fw._fmt_ms(0) == "0:00"
+    assert fw._fmt_ms(65_000) == "1:05"
+    assert fw._fmt_ms(59_999) == "0:59"
+
+
+def test_fmt_ms_hours():
+    assert fw._fmt_ms(3_723_000) == "1:02:03"
+
+
+def test_fmt_ms_odd_input():
+    """None, negative and string input (AVRCP playing time is text)."""
+    assert fw._fmt_ms(None) == "—"
+    assert fw._fmt_ms(-5) == "0:00"
+    assert fw._fmt_ms("123456") == "2:03"
+    assert fw._fmt_ms("n/a") == "n/a"
+
+
+# ---------------------------------------------------------------------------
+#  Bm83.poll framing
+# ---------------------------------------------------------------------------
+
+
+def test_bm83_frame_matches_reference(bm):
+    """_frame builds the same bytes as the reference framing."""
+    assert bytes(bm._frame(0x0F)) == bm83_frame(0x0F) == b"\xAA\x00\x01\x0F\xF0"
+    assert bytes(bm._frame(0x02, b"\x01\x00")) == bm83_frame(0x02, b"\x01\x00")
+
+
+def test_poll_single_frame(bm):
+    bm.uart.feed(bm83_frame(0x01, b"\x06"))
+    assert bm.poll() == [(0x01, b"\x06")]
+    assert bm._rx == bytearray()
+    assert bm._rx_pos == 0
+
+
+def test_poll_burst_in_order(bm):
+    """Many frames from one read come out in order, and the buffer is left empty."""
+    frames = [(0x10 + i, bytes(range(i))) for i in range(20)]
+    bm.uart.feed(b"".join(bm83_frame(op, p) for op, p in frames))
+    assert bm.poll() == frames
+    assert len(bm._rx) == 0
+
+
+def test_poll_frame_split_across_reads(bm):
+    """A partial frame waits at the cursor until the rest arrives."""
+    data = bm83_frame(0x01, b"\x06") + bm83_frame(0x1A, b"abcdef")
+    bm.uart.feed(data[:9])
+    assert bm.poll() == [(0x01, b"\x06")]
+    assert bm._rx_pos == 6  # the cursor sits on the incomplete frame
+    bm.uart.feed(data[9:])
+    assert bm.poll() == [(0x1A, b"abcdef")]
+    assert len(bm._rx) == 0
+
+
+def test_poll_compacts_large_dead_prefix(bm):
+    """Consumed bytes are dropped once the prefix exceeds RX_COMPACT_AT."""
+    big = bm83_frame(0x5D, bytes(fw.RX_COMPACT_AT))
+    tail = bm83_frame(0x01, b"\x06")
+    bm.uart.feed(big + tail[:3])
+    events = bm.poll()
+    assert [op for op, _ in events] == [0x5D]
+    assert bm._rx == bytearray(tail[:3])
+    assert bm._rx_pos == 0
+
+
+def test_poll_skips_leading_garbage(bm):
+    bm.uart.feed(b"\x00\x13\x37" + bm83_frame(0x01, b"\x06"))
+    assert bm.poll() == [(0x01, b"\x06")]
+
+
+def test_poll_zero_length_is_noise(bm):
+    """A zero length field is never a real event; the next frame still parses."""
+    bm.uart.feed(b"\xAA\x00\x00\x00" + bm83_frame(0x10, b"\x04"))
+    assert bm.poll() == [(0x10, b"\x04")]
+
+
+def test_poll_length_gate_does_not_stall(bm):
+    """An implausible length doesn't make the parser wait for 64 KiB."""
+    bm.uart.feed(b"\xAA\xFF\xFF\x01" + bm83_frame(0x10, b"\x04"))
+    assert bm.poll() == [(0x10, b"\x04")]
+    assert len(bm._rx) == 0
+
+
+def test_poll_resyncs_after_bad_checksum(bm):
+    bad = bytearray(bm83_frame(0x1A, b"abc"))
+    bad[-1] ^= 0xFF
+    bm.uart.feed(bytes(bad) + bm83_frame(0x01, b"\x06"))
+    assert bm.poll() == [(0x01, b"\x06")]
+
+
+def test_poll_recovers_frame_inside_corrupt_one(bm):
+    """A corrupt length that swallows a real frame doesn't lose it."""
+    good = bm83_frame(0x01, b"\x06")
+    # the bogus frame ends exactly where the next 0xAA starts
+    bm.uart.feed(b"\xAA\x00\x06\x1A" + good + bm83_frame(0x10, b"\x04"))
+    assert bm.poll() == [(0x01, b"\x06"), (0x10, b"\x04")]
+
+
+def test_poll_keeps_bytes_read_before_an_error(bm):
+    """A read error ends the drain; frames that already arrived still parse."""
+    frame = bm83_frame(0x01, b"\x06")
+    bm.uart.feed(frame)
+    readinto = bm.uart.readinto
+    calls = []
+
+    def flaky(buf):
+        calls.append(len(buf))
+        if len(calls) > 1:
+            raise OSError("uart")
+        return readinto(buf[:3])
+
+    bm.uart.readinto = flaky
+    assert bm.poll() == []  # only 3 bytes made it in
+    bm.uart.readinto = readinto
+    assert bm.poll() == [(0x01, b"\x06")]
+
+
+def test_ack_event(bm):
+    bm.ack_event(0x1A)
+    bm.ack_event(0x00)  # never ACKed
+    assert bm.uart.writes == [bm83_frame(0x14, b"\x1A")]
+
+
+# ---------------------------------------------------------------------------
+#  GetElementAttributes (event 0x5D) reassembly
+# ---------------------------------------------------------------------------
+
+
+def gea_attr(aid, text):
+    return struct.pack(">IHH", aid, 0x6A, len(text)) + text
+
+
+def gea_params(payload, total_len, attr_num, is_end=True):
+    return bytes([0x20, 0x00, 0x0C, 1 if is_end else 0, attr_num]) + struct.pack(">H", total_len) + payload
+
+
+def test_gea_single_fragment(bm):
+    blob = gea_attr(1, b"Song") + gea_attr(2, b"Artist") + gea_attr(7, b"123456")
+    assert bm.parse_gea_0x5d(gea_params(blob, len(blob), 3)) == (0x0C, {1: "Song", 2: "Artist", 7: "123456"})
+
+
+def test_gea_reassembles_fragments(bm):
+    blob = gea_attr(1, b"Song") + gea_attr(2, b"Artist")
+    assert bm.parse_gea_0x5d(gea_params(blob[:5], len(blob), 2, is_end=False)) is None
+    assert bm.parse_gea_0x5d(gea_params(blob[5:13], 0, 2, is_end=False)) is None
+    assert bm.parse_gea_0x5d(gea_params(blob[13:], 0, 2)) == (0x0C, {1: "Song", 2: "Artist"})
+    assert bm._gea_expect_len is None
+
+
+def test_gea_rejects_other_pdus(bm):
+    assert bm.parse_gea_0x5d(b"\x30\x00\x0C\x01\x00\x00\x00") is None
+    assert bm.parse_gea_0x5d(b"\x20\x00") is None
+
+
+def test_gea_drops_fragments_past_advertised_total(bm):
+    """A response whose end fragment was lost doesn't swallow the next one."""
+    old = gea_attr(1, b"Old title")
+    assert bm.parse_gea_0x5d(gea_params(old[:10], len(old), 1, is_end=False)) is None
+    new = gea_attr(1, b"New title") + gea_attr(2, b"Artist")
+    assert bm.parse_gea_0x5d(gea_params(new, len(new), 2)) == (0x0C, {1: "New title", 2: "Artist"})
+
+
+def test_gea_new_request_drops_stale_fragments(bm):
+    blob = gea_attr(1, b"Song")
+    bm.parse_gea_0x5d(gea_params(blob[:6], 100, 1, is_end=False))
+    bm.avrcp_get_element_attributes(0)
+    assert bm._gea_expect_len is None
+    assert bm.parse_gea_0x5d(gea_params(blob, len(blob), 1)) == (0x0C, {1: "Song"})
+
+
+def test_gea_caps_buffer(bm):
+    bm.GEA_MAX_LEN = 10
+    blob = gea_attr(1, b"Song")
+    assert bm.parse_gea_0x5d(gea_params(blob, len(blob), 1)) == (0x0C, {1: "So"})
+
+
+def test_gea_unchanged_text_attrs_left_out(bm):
+    """Title/artist/album equal to the last response are not decoded again."""
+    blob = gea_attr(1, b"Song") + gea_attr(2, b"Artist") + gea_attr(7, b"1000")
+    bm.parse_gea_0x5d(gea_params(blob, len(blob), 3))
+    blob = gea_attr(1, b"Song") + gea_attr(2, b"Other") + gea_attr(7, b"1000")
+    assert bm.parse_gea_0x5d(gea_params(blob, len(blob), 3)) == (0x0C, {2: "Other", 7: "1000"})
+
+
+# ---------------------------------------------------------------------------
+#  Nextion TX ring and text updates
+# ---------------------------------------------------------------------------
+
+
+def test_nextion_ring_drops_oldest(nx):
+    for i in range(nx.TXQ_SIZE + 3):
+        nx.enqueue(b"c%d" % i)
+    nx.TX_FLUSH_MAX = 10_000
+    nx.tick(1.0)
+    assert sent_commands(nx.uart) == [b"c%d" % i for i in range(3, nx.TXQ_SIZE + 3)]
+
+
+def test_nextion_sendme_not_queued_twice(nx):
+    nx.enqueue(b"sendme")
+    nx.enqueue(b"sendme")
+    nx.tick(1.0)
+    assert sent_commands(nx.uart) == [b"sendme"]
+
+
+def test_nextion_tick_paced_and_batched(nx):
+    nx.enqueue(b"a")
+    nx.enqueue(b"b")
+    nx.tick(1.0)
+    assert nx.uart.writes == [b"a" + TERM + b"b" + TERM]
+    nx.enqueue(b"c")
+    nx.tick(1.01)  # inside _tx_interval_s
+    assert len(nx.uart.writes) == 1
+    nx.tick(1.1)
+    assert nx.uart.writes[-1] == b"c" + TERM
+
+
+def test_nextion_tick_flush_budget(nx):
+    """One tick writes about TX_FLUSH_MAX bytes; the rest waits for the next."""
+    for i in range(20):
+        nx.enqueue(b"x" * 40)
+    nx.tick(1.0)
+    assert len(nx.uart.writes[0]) <= nx.TX_FLUSH_MAX + 43
+    nx.tick(2.0)
+    nx.tick(3.0)
+    nx.tick(4.0)
+    assert len(sent_commands(nx.uart)) == 20
+
+
+def test_nextion_newer_text_replaces_pending(nx):
+    nx.set_texts_active_page([("tTitle", "One")])
+    nx.set_texts_active_page([("tTitle", "Two")])
+    nx.tick(1.0)
+    assert sent_commands(nx.uart) == [b'tTitle.txt="Two"']
+
+
+def test_nextion_text_sanitized(nx):
+    nx.set_text_active_page("tTitle", 'a "b"')
+    nx.tick(1.0)
+    assert sent_commands(nx.uart) == [b"tTitle.txt=\"a 'b'\""]
+
+
+def test_nextion_only_dedupe_skips_shown_text(nx):
+    nx.set_texts_active_page([("tTitle", "Song"), ("tTIME_CUR", "0:01")], True)
+    nx.tick(1.0)
+    nx.set_texts_active_page([("tTIME_CUR", "0:01")], True)
+    nx.set_texts_active_page([("tTitle", "Song")])
+    del nx.uart.writes[:]
+    nx.tick(2.0)
+    # the clock was already showing 0:01; the title is written regardless
+    assert sent_commands(nx.uart) == [b'tTitle.txt="Song"']
+
+
+def test_nextion_repaint_forgets_shown(nx):
+    nx.set_texts_active_page([("tTIME_CUR", "0:01")], True)
+    nx.tick(1.0)
+    assert nx.repaint_due(10.0)
+    assert not nx.repaint_due(11.0)
+    nx.set_texts_active_page([("tTIME_CUR", "0:01")], True)
+    nx.tick(12.0)
+    assert sent_commands(nx.uart) == [b'tTIME_CUR.txt="0:01"'] * 2
+
+
+def test_nextion_write_error_requeues_text(nx):
+    attempts = []
+
+    def fail(data):
+        attempts.append(data)
+        raise OSError("uart")
+
+    nx.set_texts_active_page([("tTitle", "Song"), ("tArtist", "Band")])
+    write = nx.uart.write
+    nx.uart.write = fail
+    nx.tick(1.0)
+    assert set(nx._txt_pending) == {"tTitle", "tArtist"}
+    # the retry waits out _tx_interval_s like any other write
+    nx.tick(1.001)
+    assert len(attempts) == 1
+    assert nx.next_due() > 1.001
+    nx.uart.write = write
+    nx.tick(2.0)
+    assert sorted(sent_commands(nx.uart)) == [b'tArtist.txt="Band"', b'tTitle.txt="Song"']
+
+
+# ---------------------------------------------------------------------------
+#  Nextion RX: tokens, pages, resets
+# ---------------------------------------------------------------------------
+
+
+def test_nextion_read_tokens(nx):
+    nx.uart.feed(b"BT_PLAY" + TERM + b"\x01" + TERM + b"BT_NEXT" + TERM + b"BT_BOGUS" + TERM)
+    assert nx.read(1.0) == ([b"BT_PLAY", b"BT_NEXT"], False)
+
+
+def test_nextion_read_idle(nx):
+    assert nx.read(1.0) == ((), False)
+
+
+def test_nextion_read_token_split_across_reads(nx):
+    nx.uart.feed(b"BT_PL")
+    assert nx.read(1.0) == ([], False)
+    nx.uart.feed(b"AY" + TERM)
+    assert nx.read(1.1) == ([b"BT_PLAY"], False)
+    assert nx._rx == bytearray()
+
+
+def test_nextion_read_debounces_repeats(nx):
+    nx.uart.feed(b"BT_VOLUP" + TERM + b"BT_VOLUP" + TERM)
+    assert nx.read(1.0) == ([b"BT_VOLUP"], False)
+    nx.uart.feed(b"BT_VOLUP" + TERM)
+    assert nx.read(1.5) == ([b"BT_VOLUP"], False)
+
+
+def test_nextion_page_change_drops_pending_text(nx):
+    nx.current_page = 0
+    nx.set_text_active_page("tEQ", "ROCK")
+    nx.uart.feed(b"\x66\x01" + TERM)
+    assert nx.read(1.0) == ([], True)
+    assert nx.current_page == 1
+    assert nx._txt_pending == {}
+    nx.uart.feed(b"\x66\x01" + TERM)
+    assert nx.read(1.5) == ([], False)
+
+
+def test_nextion_startup_frame_resets_panel_state(nx):
+    nx.current_page = 1
+    nx.set_texts_active_page([("tTIME_CUR", "0:01")], True)
+    nx.tick(1.0)
+    nx.uart.feed(b"\x00\x00\x00" + TERM + b"\x88" + TERM)
+    nx.read(2.0)
+    assert nx.current_page is None
+    assert nx._txt_shown == {}
+    nx.tick(3.0)
+    assert sent_commands(nx.uart)[-1] == b"bkcmd=3"
+
+
+# ---------------------------------------------------------------------------
+#  Idle wait
+# ---------------------------------------------------------------------------
+
+
+class FakePoller:
+    def __init__(self):
+        self.timeouts = []
+
+    def poll(self, timeout_ms):
+        self.timeouts.append(timeout_ms)
+
+
+def test_uart_waiter_rounds_up_to_whole_ms():
+    """Sub-ms remainders round up; only a zero timeout polls with 0."""
+    waiter = fw.UartWaiter()
+    waiter.poller = FakePoller()
+    for timeout_s in (0.0, 0.0004, 0.001, 0.0021, 0.1):
+        waiter.wait(timeout_s)
+    assert waiter.poller.timeouts == [0, 1, 1, 3, 100]